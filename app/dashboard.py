@@ -1,12 +1,21 @@
 import streamlit as st
 import pandas as pd
-import altair as alt
-import boto3
+import base64
 import time
 import os
-from datetime import datetime, timedelta
-import plotly.express as px
-import plotly.graph_objects as go
+from datetime import datetime, timedelta, timezone
+
+# boto3, plotly.express and datasketches are imported where they are first needed so
+# importing the dashboard does not wait on them (see scripts/benchmark-dashboard-startup.py)
+
+# Upper bound of pooled HTTP connections per AWS client
+AWS_MAX_POOL_CONNECTIONS = int(os.environ.get("AWS_MAX_POOL_CONNECTIONS", "10"))
+
+# Sketch parameters, must match the streaming job
+SKETCH_HLL_LG_K = 12
+SKETCH_KLL_K = 200
+SKETCH_QUANTILES = (0.05, 0.5, 0.95)
+ALL_OPERATORS = "All operators"
 
 # Set page configuration
 st.set_page_config(
@@ -48,10 +57,17 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # ------------------ AWS Athena Connection Functions ------------------
+@st.cache_resource  # One client per service for the whole process, shared across sessions
+def get_aws_client(service_name):
+    """Create a pooled AWS client, reused so credentials, endpoints and TLS connections are resolved once."""
+    import boto3
+    from botocore.config import Config
+
+    return boto3.client(service_name, config=Config(max_pool_connections=AWS_MAX_POOL_CONNECTIONS))
+
 def initialize_athena_client():
     """Initialize AWS Athena client."""
-    client = boto3.client('athena')
-    return client
+    return get_aws_client('athena')
 
 def run_athena_query(query, database, output_location):
     """Execute an Athena query and return the results."""
@@ -73,14 +89,17 @@ def run_athena_query(query, database, output_location):
         query_status = response['QueryExecution']['Status']['State']
         
     if query_status == 'SUCCEEDED':
-        # Get the results
-        results = client.get_query_results(QueryExecutionId=query_execution_id)
-        
-        # Process the results into a DataFrame
-        columns = [col['Label'] for col in results['ResultSet']['ResultSetMetadata']['ColumnInfo']]
-        data = []
-        for row in results['ResultSet']['Rows'][1:]:  # Skip the header row
-            data.append([value.get('VarCharValue', '') for value in row['Data']])
+        # Get the results, Athena returns at most 1000 rows per page
+        paginator = client.get_paginator('get_query_results')
+        columns, data = None, []
+        for results in paginator.paginate(QueryExecutionId=query_execution_id):
+            rows = results['ResultSet']['Rows']
+            if columns is None:
+                # Process the results into a DataFrame
+                columns = [col['Label'] for col in results['ResultSet']['ResultSetMetadata']['ColumnInfo']]
+                rows = rows[1:]  # Skip the header row
+            for row in rows:
+                data.append([value.get('VarCharValue', '') for value in row['Data']])
             
         df = pd.DataFrame(data, columns=columns)
         return df
@@ -89,6 +108,24 @@ def run_athena_query(query, database, output_location):
         return None
 
 # ------------------ Data Fetching Functions ------------------
+def time_window_hours(time_filter):
+    """Convert a sidebar time window such as "6 hours" or "7 days" to hours."""
+    amount, unit = time_filter.split()
+    return int(amount) * 24 if unit.startswith('day') else int(amount)
+
+def partition_predicate(hours):
+    """Restrict the year/month/day partitions of a streaming table to the last `hours`.
+
+    The streaming tables use partition projection, which only prunes on predicates
+    against the partition columns themselves.
+    """
+    now = datetime.now(timezone.utc)
+    dates = {(now - timedelta(hours=h)).date() for h in range(hours + 1)}
+    years = ', '.join(str(year) for year in sorted({d.year for d in dates}))
+    months = ', '.join(str(month) for month in sorted({d.month for d in dates}))
+    days = ', '.join(str(day) for day in sorted({d.day for d in dates}))
+    return f'"year" IN ({years}) AND "month" IN ({months}) AND "day" IN ({days})'
+
 @st.cache_data(ttl=300)  # Cache data for 5 minutes
 def get_operator_metrics(athena_database, athena_output_location, time_filter="1 hour"):
     """Fetch the average signal strength and precision by operator."""
@@ -98,7 +135,7 @@ def get_operator_metrics(athena_database, athena_output_location, time_filter="1
            AVG("avg_precission_#1") as avg_precision
     FROM average_by_operator
     WHERE CONCAT(ingest_year, '-', ingest_month, '-', ingest_day, ' ', ingest_hour, ':00:00') >= 
-          DATE_FORMAT(DATE_ADD('hour', -{time_filter.split()[0]}, CURRENT_TIMESTAMP), '%Y-%m-%d %H:%i:%s')
+          DATE_FORMAT(DATE_ADD('hour', -{time_window_hours(time_filter)}, CURRENT_TIMESTAMP), '%Y-%m-%d %H:%i:%s')
     GROUP BY operator
     ORDER BY avg_signal_strength DESC
     """
@@ -118,7 +155,7 @@ def get_postal_code_status(athena_database, athena_output_location, time_filter=
            SUM("count_status_#0") as status_count
     FROM status_by_postal_code
     WHERE CONCAT(ingest_year, '-', ingest_month, '-', ingest_day, ' ', ingest_hour, ':00:00') >= 
-          DATE_FORMAT(DATE_ADD('hour', -{time_filter.split()[0]}, CURRENT_TIMESTAMP), '%Y-%m-%d %H:%i:%s')
+          DATE_FORMAT(DATE_ADD('hour', -{time_window_hours(time_filter)}, CURRENT_TIMESTAMP), '%Y-%m-%d %H:%i:%s')
     GROUP BY postal_code, description
     ORDER BY postal_code, status_count DESC
     """
@@ -138,7 +175,7 @@ def get_hourly_metrics(athena_database, athena_output_location, time_filter="24
            AVG("avg_precission_#1") as avg_precision
     FROM average_by_operator
     WHERE CONCAT(ingest_year, '-', ingest_month, '-', ingest_day, ' ', ingest_hour, ':00:00') >= 
-          DATE_FORMAT(DATE_ADD('hour', -{time_filter.split()[0]}, CURRENT_TIMESTAMP), '%Y-%m-%d %H:%i:%s')
+          DATE_FORMAT(DATE_ADD('hour', -{time_window_hours(time_filter)}, CURRENT_TIMESTAMP), '%Y-%m-%d %H:%i:%s')
     GROUP BY operator, CONCAT(ingest_year, '-', ingest_month, '-', ingest_day, ' ', ingest_hour, ':00:00')
     ORDER BY hour, operator
     """
@@ -150,6 +187,92 @@ def get_hourly_metrics(athena_database, athena_output_location, time_filter="24
         df['avg_precision'] = pd.to_numeric(df['avg_precision'])
     return df
 
+@st.cache_data(ttl=60)  # Alerts should surface quickly, cache for 1 minute only
+def get_anomaly_alerts(athena_database, athena_output_location, time_filter="1 hour"):
+    """Fetch the anomalies flagged by the streaming detector."""
+    hours = time_window_hours(time_filter)
+    query = f"""
+    SELECT detected_at,
+           alert_type,
+           metric,
+           operator,
+           postal_code_str as postal_code,
+           description as status_description,
+           batch_value,
+           baseline_mean,
+           z_score
+    FROM anomaly_alerts
+    WHERE {partition_predicate(hours)}
+      AND detected_at >= DATE_ADD('hour', -{hours}, CURRENT_TIMESTAMP)
+    ORDER BY detected_at DESC
+    LIMIT 500
+    """
+    
+    df = run_athena_query(query, athena_database, athena_output_location)
+    if df is not None:
+        df['detected_at'] = pd.to_datetime(df['detected_at'])
+        df['batch_value'] = pd.to_numeric(df['batch_value'])
+        df['baseline_mean'] = pd.to_numeric(df['baseline_mean'])
+        df['z_score'] = pd.to_numeric(df['z_score'])
+    return df
+
+@st.cache_data(ttl=300)  # Cache data for 5 minutes
+def get_sketch_metrics(athena_database, athena_output_location, time_filter="1 hour"):
+    """Merge the streaming job's hourly sketches into distinct-count and percentile KPIs."""
+    hours = time_window_hours(time_filter)
+    query = f"""
+    SELECT operator,
+           postal_code_hll,
+           signal_kll,
+           precision_kll
+    FROM kpi_sketches
+    WHERE {partition_predicate(hours)}
+      AND CONCAT(CAST("year" AS VARCHAR), '-', LPAD(CAST("month" AS VARCHAR), 2, '0'), '-', LPAD(CAST("day" AS VARCHAR), 2, '0'), ' ',
+                 LPAD(CAST("hour" AS VARCHAR), 2, '0'), ':00:00') >=
+          DATE_FORMAT(DATE_ADD('hour', -{hours}, CURRENT_TIMESTAMP), '%Y-%m-%d %H:00:00')
+    """
+
+    # No sketches for the window yet, the caller falls back to the exact KPIs
+    df = run_athena_query(query, athena_database, athena_output_location)
+    if df is None or df.empty:
+        return None, None
+
+    from datasketches import hll_sketch, hll_union, kll_floats_sketch
+
+    # Per-operator sketches plus a network-wide one under ALL_OPERATORS
+    postal_codes = hll_union(SKETCH_HLL_LG_K)
+    signal_sketches, precision_sketches = {}, {}
+    for row in df.itertuples(index=False):
+        postal_codes.update(hll_sketch.deserialize(base64.b64decode(row.postal_code_hll)))
+        for sketches, encoded in ((signal_sketches, row.signal_kll), (precision_sketches, row.precision_kll)):
+            sketch = kll_floats_sketch.deserialize(base64.b64decode(encoded))
+            for operator in (row.operator, ALL_OPERATORS):
+                if operator not in sketches:
+                    sketches[operator] = kll_floats_sketch(SKETCH_KLL_K)
+                sketches[operator].merge(sketch)
+
+    percentiles = []
+    for operator, signal in signal_sketches.items():
+        precision = precision_sketches[operator]
+        row = {'operator': operator}
+        for q in SKETCH_QUANTILES:
+            row[f'signal_p{round(q * 100)}'] = None if signal.is_empty() else signal.get_quantile(q)
+        for q in SKETCH_QUANTILES:
+            row[f'precision_p{round(q * 100)}'] = None if precision.is_empty() else precision.get_quantile(q)
+        percentiles.append(row)
+
+    percentile_df = pd.DataFrame(percentiles)
+    if not percentile_df.empty:
+        percentile_df = percentile_df.set_index('operator').sort_index()
+    distinct_postal_codes = postal_codes.get_result()
+    if distinct_postal_codes.is_empty():
+        return None, percentile_df
+    return round(distinct_postal_codes.get_estimate()), percentile_df
+
+def format_metric(value):
+    """Format a KPI value for st.metric, showing N/A when it is missing."""
+    return "N/A" if value is None or pd.isna(value) else f"{value:.2f}"
+
 # ------------------ Main App ------------------
 def main():
     # Sidebar configuration
@@ -191,6 +314,8 @@ def main():
         operator_metrics = get_operator_metrics(athena_database, athena_output_location, time_filter)
         postal_code_status = get_postal_code_status(athena_database, athena_output_location, time_filter)
         hourly_metrics = get_hourly_metrics(athena_database, athena_output_location, time_filter)
+        anomaly_alerts = get_anomaly_alerts(athena_database, athena_output_location, time_filter)
+        distinct_postal_codes, operator_percentiles = get_sketch_metrics(athena_database, athena_output_location, time_filter)
     
     if operator_metrics is None or postal_code_status is None:
         st.error("Failed to load data from Athena. Please check your AWS credentials and settings.")
@@ -220,10 +345,64 @@ def main():
         )
     
     with col4:
-        st.metric(
-            label="Total Postal Codes",
-            value=len(postal_code_status['postal_code'].unique()) if postal_code_status is not None else "N/A"
-        )
+        # Fall back to an exact count over the aggregated statuses when no sketches are available
+        if distinct_postal_codes is not None:
+            st.metric(
+                label="Total Postal Codes",
+                value=distinct_postal_codes,
+                help="Approximate distinct count merged from HyperLogLog sketches"
+            )
+        else:
+            st.metric(
+                label="Total Postal Codes",
+                value=postal_code_status['postal_code'].nunique()
+            )
+    
+    # Signal and Precision Percentiles
+    if operator_percentiles is not None and not operator_percentiles.empty:
+        st.markdown("<h2 class='sub-header'>Signal and Precision Percentiles</h2>", unsafe_allow_html=True)
+        
+        network_percentiles = operator_percentiles.loc[ALL_OPERATORS]
+        columns = st.columns(len(SKETCH_QUANTILES) * 2)
+        
+        for i, q in enumerate(SKETCH_QUANTILES):
+            with columns[i]:
+                st.metric(
+                    label=f"Signal p{round(q * 100)}",
+                    value=format_metric(network_percentiles[f'signal_p{round(q * 100)}'])
+                )
+            with columns[len(SKETCH_QUANTILES) + i]:
+                st.metric(
+                    label=f"GPS Precision p{round(q * 100)}",
+                    value=format_metric(network_percentiles[f'precision_p{round(q * 100)}'])
+                )
+        
+        st.dataframe(operator_percentiles.drop(index=ALL_OPERATORS), use_container_width=True)
+    
+    # Anomaly Alerts Section
+    st.markdown("<h2 class='sub-header'>Anomaly Alerts</h2>", unsafe_allow_html=True)
+    
+    if anomaly_alerts is not None and not anomaly_alerts.empty:
+        deviations = anomaly_alerts[anomaly_alerts['alert_type'] == 'deviation']
+        signal_alerts = deviations[deviations['metric'] == 'avg_signal']
+        status_alerts = deviations[deviations['metric'] == 'status_share']
+        silence_alerts = anomaly_alerts[anomaly_alerts['alert_type'] == 'silence']
+        
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric(label="Operator Signal Alerts", value=len(signal_alerts))
+        with col2:
+            st.metric(label="Postal Code Status Alerts", value=len(status_alerts))
+        with col3:
+            st.metric(label="Silent Operators / Postal Codes", value=len(silence_alerts))
+        
+        st.warning(f"{len(anomaly_alerts)} anomalies detected in the last {time_filter}.")
+        st.dataframe(anomaly_alerts, use_container_width=True)
+    elif anomaly_alerts is not None:
+        st.success(f"No anomalies detected in the last {time_filter}.")
+    
+    import plotly.express as px
+    import plotly.graph_objects as go
     
     # Operator Metrics Section
     st.markdown("<h2 class='sub-header'>Operator Performance Metrics</h2>", unsafe_allow_html=True)
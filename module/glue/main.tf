@@ -112,3 +112,189 @@ resource "aws_glue_job" "MyStreamingJob" {
     max_concurrent_runs = 1
   }
 }
+
+resource "aws_glue_job" "spark_stream_job" {
+  name              = "spark-stream-job"
+  role_arn          = aws_iam_role.glue_service_role.arn
+  glue_version      = "5.0"
+  worker_type       = "G.1X"
+  number_of_workers = 2
+  max_retries       = 0
+  default_arguments = {
+    "--TempDir"                   = "s3://aws-glue-assets-${var.account_id}-eu-west-1/temporary/"
+    "--enable-metrics"            = "true"
+    "--job-language"              = "python"
+    "--extra-py-files"            = "s3://aws-glue-assets-${var.account_id}-eu-west-1/scripts/anomaly_detection.py,s3://aws-glue-assets-${var.account_id}-eu-west-1/scripts/record_parsing.py"
+    "--additional-python-modules" = "datasketches"
+    "--kinesis_stream_arn"        = var.stream_arn
+    "--window_size"               = "100"
+    "--output_path"               = "s3://${var.lake_bucket_name}/streaming"
+  }
+  command {
+    name            = "gluestreaming"
+    python_version  = "3"
+    script_location = "s3://aws-glue-assets-${var.account_id}-eu-west-1/scripts/spark-stream-job.py"
+  }
+  execution_property {
+    max_concurrent_runs = 1
+  }
+}
+
+# Streaming outputs are registered with partition projection so new hourly partitions
+# are queryable without waiting for a crawler run
+resource "aws_glue_catalog_table" "anomaly_alerts" {
+  name          = "anomaly_alerts"
+  database_name = aws_glue_catalog_database.my_catalog_database.name
+  table_type    = "EXTERNAL_TABLE"
+
+  parameters = {
+    "classification"            = "parquet"
+    "projection.enabled"        = "true"
+    "projection.year.type"      = "integer"
+    "projection.year.range"     = "2025,2099"
+    "projection.month.type"     = "integer"
+    "projection.month.range"    = "1,12"
+    "projection.day.type"       = "integer"
+    "projection.day.range"      = "1,31"
+    "projection.hour.type"      = "integer"
+    "projection.hour.range"     = "0,23"
+    "storage.location.template" = "s3://${var.lake_bucket_name}/streaming/metrics/anomaly_alerts/year=$${year}/month=$${month}/day=$${day}/hour=$${hour}"
+  }
+
+  partition_keys {
+    name = "year"
+    type = "int"
+  }
+  partition_keys {
+    name = "month"
+    type = "int"
+  }
+  partition_keys {
+    name = "day"
+    type = "int"
+  }
+  partition_keys {
+    name = "hour"
+    type = "int"
+  }
+
+  storage_descriptor {
+    location      = "s3://${var.lake_bucket_name}/streaming/metrics/anomaly_alerts/"
+    input_format  = "org.apache.hadoop.hive.ql.io.parquet.MapredParquetInputFormat"
+    output_format = "org.apache.hadoop.hive.ql.io.parquet.MapredParquetOutputFormat"
+
+    ser_de_info {
+      serialization_library = "org.apache.hadoop.hive.ql.io.parquet.serde.ParquetHiveSerDe"
+    }
+
+    columns {
+      name = "alert_type"
+      type = "string"
+    }
+    columns {
+      name = "metric"
+      type = "string"
+    }
+    columns {
+      name = "operator"
+      type = "string"
+    }
+    columns {
+      name = "postal_code_str"
+      type = "string"
+    }
+    columns {
+      name = "description"
+      type = "string"
+    }
+    columns {
+      name = "batch_value"
+      type = "double"
+    }
+    columns {
+      name = "baseline_mean"
+      type = "double"
+    }
+    columns {
+      name = "baseline_std"
+      type = "double"
+    }
+    columns {
+      name = "z_score"
+      type = "double"
+    }
+    columns {
+      name = "detected_at"
+      type = "timestamp"
+    }
+  }
+}
+
+# One row per operator and hour, rolled up by the streaming job from its per-batch partials
+resource "aws_glue_catalog_table" "kpi_sketches" {
+  name          = "kpi_sketches"
+  database_name = aws_glue_catalog_database.my_catalog_database.name
+  table_type    = "EXTERNAL_TABLE"
+
+  parameters = {
+    "classification"            = "parquet"
+    "projection.enabled"        = "true"
+    "projection.year.type"      = "integer"
+    "projection.year.range"     = "2025,2099"
+    "projection.month.type"     = "integer"
+    "projection.month.range"    = "1,12"
+    "projection.day.type"       = "integer"
+    "projection.day.range"      = "1,31"
+    "projection.hour.type"      = "integer"
+    "projection.hour.range"     = "0,23"
+    "storage.location.template" = "s3://${var.lake_bucket_name}/streaming/metrics/kpi_sketches/year=$${year}/month=$${month}/day=$${day}/hour=$${hour}"
+  }
+
+  partition_keys {
+    name = "year"
+    type = "int"
+  }
+  partition_keys {
+    name = "month"
+    type = "int"
+  }
+  partition_keys {
+    name = "day"
+    type = "int"
+  }
+  partition_keys {
+    name = "hour"
+    type = "int"
+  }
+
+  storage_descriptor {
+    location      = "s3://${var.lake_bucket_name}/streaming/metrics/kpi_sketches/"
+    input_format  = "org.apache.hadoop.hive.ql.io.parquet.MapredParquetInputFormat"
+    output_format = "org.apache.hadoop.hive.ql.io.parquet.MapredParquetOutputFormat"
+
+    ser_de_info {
+      serialization_library = "org.apache.hadoop.hive.ql.io.parquet.serde.ParquetHiveSerDe"
+    }
+
+    columns {
+      name = "operator"
+      type = "string"
+    }
+    columns {
+      name = "record_count"
+      type = "bigint"
+    }
+    columns {
+      name = "postal_code_hll"
+      type = "string"
+    }
+    columns {
+      name = "signal_kll"
+      type = "string"
+    }
+    columns {
+      name = "precision_kll"
+      type = "string"
+    }
+  }
+}
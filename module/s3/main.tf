@@ -2,6 +2,24 @@ resource "aws_s3_bucket" "my_bucket" {
   bucket = var.lake_bucket_name
 }
 
+# Per-batch sketch partials are only re-read while their hour can still receive records
+resource "aws_s3_bucket_lifecycle_configuration" "lake_bucket_lifecycle" {
+  bucket = aws_s3_bucket.my_bucket.id
+
+  rule {
+    id     = "expire-kpi-sketch-partials"
+    status = "Enabled"
+
+    filter {
+      prefix = "streaming/metrics/kpi_sketch_partials/"
+    }
+
+    expiration {
+      days = 7
+    }
+  }
+}
+
 resource "aws_s3_bucket" "glue_bucket" {
   bucket              = "aws-glue-assets-${var.account_id}-eu-west-1"
   bucket_prefix       = null
@@ -10,3 +28,24 @@ resource "aws_s3_bucket" "glue_bucket" {
   tags                = {}
   tags_all            = {}
 }
+
+resource "aws_s3_object" "spark_stream_job_script" {
+  bucket = aws_s3_bucket.glue_bucket.id
+  key    = "scripts/spark-stream-job.py"
+  source = "${path.module}/scripts/spark-stream-job.py"
+  etag   = filemd5("${path.module}/scripts/spark-stream-job.py")
+}
+
+resource "aws_s3_object" "anomaly_detection_module" {
+  bucket = aws_s3_bucket.glue_bucket.id
+  key    = "scripts/anomaly_detection.py"
+  source = "${path.module}/scripts/anomaly_detection.py"
+  etag   = filemd5("${path.module}/scripts/anomaly_detection.py")
+}
+
+resource "aws_s3_object" "record_parsing_module" {
+  bucket = aws_s3_bucket.glue_bucket.id
+  key    = "scripts/record_parsing.py"
+  source = "${path.module}/scripts/record_parsing.py"
+  etag   = filemd5("${path.module}/scripts/record_parsing.py")
+}
@@ -0,0 +1,43 @@
+"""EWMA baseline scoring used by the streaming anomaly detector in spark-stream-job.py.
+
+Shipped to Glue with --extra-py-files so the executors can import it.
+"""
+import math
+
+def ewma_update(mean, var, value, alpha):
+    """Fold one observation into an exponentially weighted mean and variance."""
+    diff = value - mean
+    increment = alpha * diff
+    return mean + increment, (1 - alpha) * (var + diff * increment)
+
+def share_std(share, records, min_share):
+    """Binomial std of a share measured over `records` records.
+
+    The share is kept `min_share` away from 0 and 1, where the binomial std vanishes.
+    """
+    share = min(max(share, min_share), 1 - min_share)
+    return math.sqrt(share * (1 - share) / records)
+
+def observe(state, value, alpha, z_threshold, warmup, min_std, std=None, two_sided=True):
+    """Score `value` against the (n, mean, var) baseline in `state` and update it.
+
+    The value is scored against `std` when given, otherwise against the EWMA std,
+    floored at `min_std`. A one-sided detector only flags values above the baseline.
+    Returns the new state and the (z_score, std, baseline_mean) of the observation
+    when it is an anomaly, None otherwise. An anomalous value is clipped to the
+    threshold before it is folded in so one spike does not drag the baseline.
+    """
+    if state is None:
+        return (1, value, 0.0), None
+
+    n, mean, var = state
+    std = max(math.sqrt(var) if std is None else std, min_std)
+    z_score = (value - mean) / std
+
+    anomaly = None
+    if n >= warmup and (abs(z_score) if two_sided else z_score) >= z_threshold:
+        anomaly = (z_score, std, mean)
+        value = mean + math.copysign(z_threshold * std, z_score)
+
+    mean, var = ewma_update(mean, var, value, alpha)
+    return (n + 1, mean, var), anomaly
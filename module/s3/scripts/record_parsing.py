@@ -0,0 +1,41 @@
+"""Parsing of the uploader's Kinesis payloads used by spark-stream-job.py.
+
+app.py sends every CSV row as a JSON object of strings ("signal": "2",
+"postal_code": "250236.0"), and from_json returns NULL for a string read into a
+numeric field. The payload is parsed as strings and cast afterwards, like the
+ApplyMapping node of scripts/transform-stream-data.py.
+
+Shipped to Glue with --extra-py-files so the job can import it.
+"""
+from pyspark.sql.functions import col, from_json
+from pyspark.sql.types import StructType, StructField, StringType
+
+# CSV columns in file order
+RECORD_FIELDS = [
+    "hour", "lat", "long", "signal", "network", "operator", "status", "description",
+    "speed", "satellites", "precission", "provider", "activity", "postal_code"
+]
+
+# Columns cast after parsing, the others stay strings
+RECORD_TYPES = {
+    "lat": "double",
+    "long": "double",
+    "signal": "int",
+    "status": "int",
+    "speed": "double",
+    "satellites": "double",
+    "precission": "double",
+    "postal_code": "double"
+}
+
+payload_schema = StructType([StructField(field, StringType(), True) for field in RECORD_FIELDS])
+
+def parse_records(json_df, column="json_data"):
+    """Parse the JSON payloads in `column` into one typed column per CSV field."""
+    parsed_df = json_df \
+        .select(from_json(column, payload_schema).alias("parsed_data")) \
+        .select("parsed_data.*")
+    return parsed_df.select(*[
+        col(field).cast(RECORD_TYPES[field]).alias(field) if field in RECORD_TYPES else col(field)
+        for field in RECORD_FIELDS
+    ])
@@ -8,6 +8,7 @@ from awsglue.job import Job
 from pyspark.sql import SparkSession
 from pyspark.sql.functions import *
 from pyspark.sql.types import *
+from record_parsing import parse_records
 
 # Set up logger
 logger = logging.getLogger()
@@ -36,34 +37,17 @@ job.init(args['JOB_NAME'], args)
 
 logger.info("Job initialized successfully.")
 
-# Define schema for the incoming data
-schema = StructType([
-    StructField("hour", StringType(), True),
-    StructField("lat", DoubleType(), True),
-    StructField("long", DoubleType(), True),
-    StructField("signal", IntegerType(), True),
-    StructField("network", StringType(), True),
-    StructField("operator", StringType(), True),
-    StructField("status", IntegerType(), True),
-    StructField("description", StringType(), True),
-    StructField("speed", DoubleType(), True),
-    StructField("satellites", DoubleType(), True),
-    StructField("precission", DoubleType(), True),
-    StructField("provider", StringType(), True),
-    StructField("activity", StringType(), True),
-    StructField("postal_code", DoubleType(), True)
-])
-
 # Create data source using Spark Structured Streaming instead of DynamicFrame
 logger.info(f"Connecting to Kinesis stream: {args['kinesis_stream_arn']}")
 try:
-    # Extract stream name from ARN
+    # Extract stream name and region from ARN (arn:aws:kinesis:<region>:<account>:stream/<name>)
     stream_name = args['kinesis_stream_arn'].split("/")[-1]
+    stream_region = args['kinesis_stream_arn'].split(":")[3]
     
     kinesis_stream = spark.readStream \
         .format("kinesis") \
         .option("streamName", stream_name) \
-        .option("endpointUrl", "https://kinesis.us-east-1.amazonaws.com") \
+        .option("endpointUrl", f"https://kinesis.{stream_region}.amazonaws.com") \
         .option("awsUseInstanceProfile", "true") \
         .option("startingPosition", "latest") \
         .load()
@@ -73,11 +57,9 @@ except Exception as e:
     logger.error(f"Error connecting to Kinesis stream: {str(e)}")
     raise
 
-# Parse the JSON data with the defined schema
+# Parse the JSON data, the uploader sends every value as a string (see record_parsing.py)
 logger.info("Parsing incoming Kinesis data...")
-parsed_df = kinesis_stream.selectExpr("CAST(data AS STRING) as json_data") \
-    .select(from_json("json_data", schema).alias("parsed_data")) \
-    .select("parsed_data.*")
+parsed_df = parse_records(kinesis_stream.selectExpr("CAST(data AS STRING) as json_data"))
 
 # Add processing timestamp column
 df_with_timestamp = parsed_df.withColumn(
@@ -188,6 +170,321 @@ except Exception as e:
     logger.error(f"Error writing network status data: {str(e)}")
     raise
 
+# KPI 4: Streaming anomaly detection over operator signal and postal code statuses
+# Each key keeps a fixed-size EWMA state in the Spark state store, so memory grows
+# linearly with the number of keys and not with history. The scoring itself lives in
+# anomaly_detection.py, shipped with --extra-py-files.
+ANOMALY_ALPHA = 0.1            # EWMA smoothing factor
+ANOMALY_Z_THRESHOLD = 4.0      # |z| at or above this value raises an alert
+ANOMALY_WARMUP_BATCHES = 5     # batches observed per key before alerting
+ANOMALY_MIN_SIGNAL_STD = 0.5  # floor for the signal EWMA std to avoid alerting on flat series
+ANOMALY_MIN_RECORDS = 5       # records a postal code needs in a batch for its status shares to be scored
+ANOMALY_MIN_SHARE = 0.05      # keeps the binomial std of a share away from 0
+ANOMALY_SILENT_BATCHES = 3     # empty trigger intervals before a regular key counts as silent
+ANOMALY_MIN_PRESENCE = 0.6     # presence EWMA a key needs for its silence to alert
+ANOMALY_MAX_IDLE_BATCHES = 60  # empty trigger intervals before a key's state is evicted
+ANOMALY_TIMEOUT_MS = int(float(args['window_size']) * 1000)
+
+# Every record of a postal code is scored against each status, so a status is tracked
+# as its share of the postal code's records and does not scale with the batch size.
+# Shares are scored against their binomial std at the batch's record count, so a postal
+# code reporting one or two records does not alert on every status change.
+NETWORK_STATUSES = ["STATE_IN_SERVICE", "STATE_OUT_OF_SERVICE", "STATE_EMERGENCY_ONLY", "STATE_POWER_OFF"]
+# The in-service share mirrors the degraded ones, so it only reports silent postal codes
+IN_SERVICE_STATUS = "STATE_IN_SERVICE"
+
+anomaly_state_schema = "n long, mean double, var double, idle long, presence double"
+anomaly_output_schema = StructType([
+    StructField("alert_type", StringType(), True),
+    StructField("metric", StringType(), True),
+    StructField("operator", StringType(), True),
+    StructField("postal_code_str", StringType(), True),
+    StructField("description", StringType(), True),
+    StructField("batch_value", DoubleType(), True),
+    StructField("baseline_mean", DoubleType(), True),
+    StructField("baseline_std", DoubleType(), True),
+    StructField("z_score", DoubleType(), True),
+    StructField("detected_at", TimestampType(), True)
+])
+
+def detect_anomalies(key, pdf_iter, state):
+    """Score one key's micro-batch value against its EWMA baseline and update the state.
+
+    Keys without records time out once per trigger interval: the interval is folded
+    into the key's presence as a zero, a regularly reporting key that goes silent
+    raises one alert, and keys idle for ANOMALY_MAX_IDLE_BATCHES are evicted.
+    """
+    import builtins
+    import math
+    import pandas as pd
+    from anomaly_detection import observe, share_std
+
+    # builtins is used explicitly because the wildcard pyspark.sql.functions import
+    # shadows max at module level
+    metric, operator, postal_code_str, description = key
+    alert = {"metric": metric, "operator": operator, "postal_code_str": postal_code_str, "description": description}
+
+    if state.hasTimedOut:
+        n, mean, var, idle, presence = state.get
+        idle += 1
+        if idle >= ANOMALY_MAX_IDLE_BATCHES:
+            state.remove()
+            return
+        presence *= 1 - ANOMALY_ALPHA
+        state.update((n, mean, var, idle, presence))
+        state.setTimeoutDuration(ANOMALY_TIMEOUT_MS)
+        # Undo the idle decay to compare the presence the key had when it went quiet
+        was_regular = presence >= ANOMALY_MIN_PRESENCE * (1 - ANOMALY_ALPHA) ** idle
+        if idle == ANOMALY_SILENT_BATCHES and was_regular and description in (None, IN_SERVICE_STATUS):
+            yield pd.DataFrame([{
+                **alert,
+                "alert_type": "silence",
+                "batch_value": None,
+                "baseline_mean": mean,
+                "baseline_std": None,
+                "z_score": None,
+                "detected_at": pd.Timestamp.now()
+            }])
+        return
+
+    total, rows, detected_at = 0.0, 0, None
+    for pdf in pdf_iter:
+        total += float(pdf["value"].sum())
+        rows += len(pdf)
+        batch_max = pdf["processing_time"].max()
+        detected_at = batch_max if detected_at is None else builtins.max(detected_at, batch_max)
+
+    if rows == 0:
+        return
+
+    # Mean signal for operators, share of the postal code's records for statuses
+    value = total / rows
+    if state.exists:
+        n, mean, var, idle, presence = state.get
+        baseline = (n, mean, var)
+    else:
+        baseline, presence = None, 0.0
+    presence += ANOMALY_ALPHA * (1.0 - presence)
+
+    if metric == "status_share":
+        # Only a rise of a degraded status alerts, small batches just feed the baseline
+        std = share_std(baseline[1], rows, ANOMALY_MIN_SHARE) if baseline is not None else None
+        scored = rows >= ANOMALY_MIN_RECORDS and description != IN_SERVICE_STATUS
+        z_threshold = ANOMALY_Z_THRESHOLD if scored else math.inf
+        baseline, anomaly = observe(baseline, value, ANOMALY_ALPHA, z_threshold, ANOMALY_WARMUP_BATCHES, 0.0, std=std, two_sided=False)
+    else:
+        baseline, anomaly = observe(baseline, value, ANOMALY_ALPHA, ANOMALY_Z_THRESHOLD, ANOMALY_WARMUP_BATCHES, ANOMALY_MIN_SIGNAL_STD)
+    state.update(baseline + (0, presence))
+    state.setTimeoutDuration(ANOMALY_TIMEOUT_MS)
+
+    if anomaly is not None:
+        z_score, std, mean = anomaly
+        yield pd.DataFrame([{
+            **alert,
+            "alert_type": "deviation",
+            "batch_value": value,
+            "baseline_mean": mean,
+            "baseline_std": std,
+            "z_score": z_score,
+            "detected_at": detected_at
+        }])
+
+# Both detectors share one stateful operator and one sink; unused key columns are null
+signal_observations = df_with_partitions \
+    .where(col("operator").isNotNull() & col("signal").isNotNull()) \
+    .select(
+        lit("avg_signal").alias("metric"),
+        col("operator"),
+        lit(None).cast("string").alias("postal_code_str"),
+        lit(None).cast("string").alias("description"),
+        col("signal").cast("double").alias("value"),
+        col("processing_time")
+    )
+
+status_observations = df_with_partitions \
+    .where(col("postal_code_str").isNotNull() & col("description").isNotNull()) \
+    .select(
+        col("postal_code_str"),
+        col("description").alias("record_description"),
+        explode(array(*[lit(status) for status in NETWORK_STATUSES])).alias("description"),
+        col("processing_time")
+    ) \
+    .select(
+        lit("status_share").alias("metric"),
+        lit(None).cast("string").alias("operator"),
+        col("postal_code_str"),
+        col("description"),
+        (col("record_description") == col("description")).cast("double").alias("value"),
+        col("processing_time")
+    )
+
+anomaly_df = signal_observations.unionByName(status_observations) \
+    .groupBy("metric", "operator", "postal_code_str", "description") \
+    .applyInPandasWithState(
+        detect_anomalies,
+        outputStructType=anomaly_output_schema,
+        stateStructType=anomaly_state_schema,
+        outputMode="append",
+        timeoutConf="ProcessingTimeTimeout"
+    ) \
+    .withColumn("year", year("detected_at")) \
+    .withColumn("month", month("detected_at")) \
+    .withColumn("day", dayofmonth("detected_at")) \
+    .withColumn("hour", hour("detected_at"))
+
+anomaly_alerts_path = f"{args['output_path']}/metrics/anomaly_alerts"
+logger.info(f"Writing anomaly alerts to: {anomaly_alerts_path}")
+
+try:
+    query_anomalies = anomaly_df \
+    .writeStream \
+    .outputMode("append") \
+    .format("parquet") \
+    .partitionBy("year", "month", "day", "hour") \
+    .option("checkpointLocation", f"{anomaly_alerts_path}/_checkpoints") \
+    .option("path", anomaly_alerts_path) \
+    .trigger(processingTime=f"{args['window_size']} seconds") \
+    .start()
+
+    logger.info(f"Anomaly alert writing started successfully to {anomaly_alerts_path}.")
+except Exception as e:
+    logger.error(f"Error writing anomaly alerts: {str(e)}")
+    raise
+
+# KPI 5: Mergeable sketches per operator and hour
+# Every micro-batch writes one partial sketch row per operator/hour under its batch_id,
+# so a retried batch replaces its own partials instead of counting twice. The hours
+# touched by the batch are then rolled up into one row per operator/hour, which is
+# what the dashboard merges over its time window. Sketches are stored base64-encoded
+# so they survive the round trip through Athena result sets.
+# Requires the Glue job argument: --additional-python-modules datasketches
+SKETCH_HLL_LG_K = 12    # ~1.6% relative error on distinct counts
+SKETCH_KLL_K = 200      # ~1.3% normalized rank error on quantiles
+
+sketch_output_schema = StructType([
+    StructField("operator", StringType(), True),
+    StructField("year", IntegerType(), True),
+    StructField("month", IntegerType(), True),
+    StructField("day", IntegerType(), True),
+    StructField("hour", IntegerType(), True),
+    StructField("record_count", LongType(), True),
+    StructField("postal_code_hll", StringType(), True),
+    StructField("signal_kll", StringType(), True),
+    StructField("precision_kll", StringType(), True)
+])
+
+def sketch_row(first, record_count, postal_codes, signal, precision):
+    """Serialize the sketches of one operator/hour group into an output row."""
+    import base64
+
+    return {
+        "operator": first["operator"],
+        "year": int(first["year"]),
+        "month": int(first["month"]),
+        "day": int(first["day"]),
+        "hour": int(first["hour"]),
+        "record_count": int(record_count),
+        "postal_code_hll": base64.b64encode(postal_codes.serialize_compact()).decode("ascii"),
+        "signal_kll": base64.b64encode(signal.serialize()).decode("ascii"),
+        "precision_kll": base64.b64encode(precision.serialize()).decode("ascii")
+    }
+
+def build_sketches(pdf):
+    """Build the HLL and KLL sketches for one operator/hour group of a micro-batch."""
+    import pandas as pd
+    from datasketches import hll_sketch, kll_floats_sketch
+
+    postal_codes = hll_sketch(SKETCH_HLL_LG_K)
+    for postal_code in pdf["postal_code_str"].dropna().unique():
+        postal_codes.update(postal_code)
+
+    signal = kll_floats_sketch(SKETCH_KLL_K)
+    signal.update(pdf["signal"].dropna().to_numpy(dtype="float32"))
+
+    precision = kll_floats_sketch(SKETCH_KLL_K)
+    precision.update(pdf["precission"].dropna().to_numpy(dtype="float32"))
+
+    return pd.DataFrame([sketch_row(pdf.iloc[0], len(pdf), postal_codes, signal, precision)])
+
+def merge_sketches(pdf):
+    """Merge the partial sketches of one operator/hour into a single row."""
+    import base64
+    import pandas as pd
+    from datasketches import hll_sketch, hll_union, kll_floats_sketch
+
+    postal_codes = hll_union(SKETCH_HLL_LG_K)
+    signal = kll_floats_sketch(SKETCH_KLL_K)
+    precision = kll_floats_sketch(SKETCH_KLL_K)
+    for row in pdf.itertuples(index=False):
+        postal_codes.update(hll_sketch.deserialize(base64.b64decode(row.postal_code_hll)))
+        signal.merge(kll_floats_sketch.deserialize(base64.b64decode(row.signal_kll)))
+        precision.merge(kll_floats_sketch.deserialize(base64.b64decode(row.precision_kll)))
+
+    return pd.DataFrame([sketch_row(pdf.iloc[0], pdf["record_count"].sum(), postal_codes.get_result(), signal, precision)])
+
+kpi_sketches_path = f"{args['output_path']}/metrics/kpi_sketches"
+kpi_sketch_partials_path = f"{args['output_path']}/metrics/kpi_sketch_partials"
+logger.info(f"Writing KPI sketches to: {kpi_sketches_path}")
+
+def write_sketches(batch_df, batch_id):
+    """Write the partial sketches of one micro-batch and roll up the hours it touched."""
+    # Persisted so the Kinesis records are not read again after isEmpty()
+    batch_df.persist()
+    if batch_df.isEmpty():
+        batch_df.unpersist()
+        return
+
+    partials_df = batch_df \
+        .where(col("operator").isNotNull()) \
+        .select("operator", "year", "month", "day", "hour", "postal_code_str", "signal", "precission") \
+        .groupBy("operator", "year", "month", "day", "hour") \
+        .applyInPandas(build_sketches, schema=sketch_output_schema) \
+        .withColumn("batch_id", lit(batch_id)) \
+        .persist()
+
+    # Dynamic overwrite only replaces the partitions this batch writes
+    partials_df.write \
+        .mode("overwrite") \
+        .option("partitionOverwriteMode", "dynamic") \
+        .partitionBy("year", "month", "day", "hour", "batch_id") \
+        .parquet(kpi_sketch_partials_path)
+
+    hours = partials_df.select("year", "month", "day", "hour").distinct().collect()
+    partials_df.unpersist()
+    batch_df.unpersist()
+    if not hours:
+        return
+
+    # Only the touched hours are listed, not the whole partials tree
+    hour_paths = [
+        f"{kpi_sketch_partials_path}/year={row['year']}/month={row['month']}/day={row['day']}/hour={row['hour']}"
+        for row in hours
+    ]
+    spark.read \
+        .option("basePath", kpi_sketch_partials_path) \
+        .parquet(*hour_paths) \
+        .select(*sketch_output_schema.fieldNames()) \
+        .groupBy("operator", "year", "month", "day", "hour") \
+        .applyInPandas(merge_sketches, schema=sketch_output_schema) \
+        .write \
+        .mode("overwrite") \
+        .option("partitionOverwriteMode", "dynamic") \
+        .partitionBy("year", "month", "day", "hour") \
+        .parquet(kpi_sketches_path)
+
+try:
+    query_sketches = df_with_partitions \
+    .writeStream \
+    .foreachBatch(write_sketches) \
+    .option("checkpointLocation", f"{kpi_sketches_path}/_checkpoints") \
+    .trigger(processingTime=f"{args['window_size']} seconds") \
+    .start()
+
+    logger.info(f"KPI sketch writing started successfully to {kpi_sketches_path}.")
+except Exception as e:
+    logger.error(f"Error writing KPI sketches: {str(e)}")
+    raise
+
 # Wait for all queries to terminate
 logger.info("Waiting for all streams to terminate...")
 try:
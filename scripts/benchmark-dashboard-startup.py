@@ -0,0 +1,150 @@
+"""Benchmark the import time of the Streamlit dashboard.
+
+Each run imports app/dashboard.py in a fresh interpreter (as a new ECS task would)
+and records the import time and which heavy modules were loaded. The module is not
+run as __main__, so this covers the top-level setup only, not main() or any Athena
+query. The script exits with a non-zero status when the median import time exceeds
+--max-seconds or when a module that should be deferred is imported at startup.
+
+With --client-calls it also times real Athena GetQueryExecution calls against a
+local stub endpoint, creating a new client per call versus reusing one pooled
+client configured like the dashboard's.
+
+    python scripts/benchmark-dashboard-startup.py --runs 5 --max-seconds 3 --client-calls 200
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DASHBOARD_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app", "dashboard.py")
+
+# Modules that must only be imported once a chart or a backend needs them. Streamlit
+# itself imports the plotly package for its chart theme, so only plotly.express is checked
+DEFERRED_MODULES = ["altair", "boto3", "botocore", "plotly.express", "datasketches"]
+
+# Runs in the child interpreter, prints a JSON report on its last line
+PROBE = """
+import importlib.util, json, sys, time
+start = time.perf_counter()
+spec = importlib.util.spec_from_file_location("dashboard", sys.argv[1])
+module = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(module)
+elapsed = time.perf_counter() - start
+print(json.dumps({
+    "import_seconds": elapsed,
+    "loaded": sorted(name for name in sys.argv[2:] if name in sys.modules)
+}))
+"""
+
+def measure_import(runs):
+    """Import the dashboard in `runs` fresh interpreters and collect the reports."""
+    reports = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, "-c", PROBE, DASHBOARD_PATH, *DEFERRED_MODULES],
+            capture_output=True,
+            text=True,
+            check=True
+        )
+        report = json.loads(result.stdout.strip().splitlines()[-1])
+        report["process_seconds"] = time.perf_counter() - start
+        reports.append(report)
+    return reports
+
+class StubAthenaHandler(BaseHTTPRequestHandler):
+    """Answers every Athena call with a succeeded query, over keep-alive HTTP/1.1."""
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes, which Nagle would hold back on a reused connection
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        body = json.dumps({"QueryExecution": {"QueryExecutionId": "benchmark", "Status": {"State": "SUCCEEDED"}}}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-amz-json-1.1")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def measure_client_reuse(calls):
+    """Time `calls` Athena requests with a new client per call and with one pooled client.
+
+    Returns the mean seconds per call of each. The endpoint is plain HTTP, so the TLS
+    handshake a new client repeats against the real endpoint is not included.
+    """
+    import boto3
+    from botocore.config import Config
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubAthenaHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    client_kwargs = {
+        "region_name": "eu-west-1",
+        "endpoint_url": f"http://127.0.0.1:{server.server_address[1]}",
+        "aws_access_key_id": "benchmark",
+        "aws_secret_access_key": "benchmark"
+    }
+    # Same pool size as the dashboard's get_aws_client
+    pool_size = int(os.environ.get("AWS_MAX_POOL_CONNECTIONS", "10"))
+
+    try:
+        start = time.perf_counter()
+        for _ in range(calls):
+            boto3.client("athena", **client_kwargs).get_query_execution(QueryExecutionId="benchmark")
+        per_call_new = (time.perf_counter() - start) / calls
+
+        # The pooled client's creation is part of the measurement, amortized over the calls
+        start = time.perf_counter()
+        client = boto3.client("athena", config=Config(max_pool_connections=pool_size), **client_kwargs)
+        for _ in range(calls):
+            client.get_query_execution(QueryExecutionId="benchmark")
+        per_call_pooled = (time.perf_counter() - start) / calls
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    return per_call_new, per_call_pooled
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the dashboard import time.")
+    parser.add_argument("--runs", type=int, default=5, help="Number of fresh interpreters to time")
+    parser.add_argument("--max-seconds", type=float, default=None, help="Fail when the median import time exceeds this")
+    parser.add_argument("--client-calls", type=int, default=0, help="Also time this many Athena calls against a local stub endpoint")
+    args = parser.parse_args()
+
+    reports = measure_import(args.runs)
+    import_times = [report["import_seconds"] for report in reports]
+    process_times = [report["process_seconds"] for report in reports]
+    loaded = sorted({name for report in reports for name in report["loaded"]})
+
+    median_import = statistics.median(import_times)
+    print(f"Dashboard import (median of {args.runs}): {median_import:.3f}s "
+          f"[min {min(import_times):.3f}s, max {max(import_times):.3f}s]")
+    print(f"Interpreter + import (median): {statistics.median(process_times):.3f}s")
+    print(f"Deferred modules loaded at startup: {', '.join(loaded) if loaded else 'none'}")
+
+    if args.client_calls > 0:
+        per_call_new, per_call_pooled = measure_client_reuse(args.client_calls)
+        print(f"Athena call against a local stub ({args.client_calls} calls): "
+              f"new client {per_call_new * 1000:.2f}ms, pooled client {per_call_pooled * 1000:.2f}ms")
+
+    failed = False
+    if loaded:
+        print(f"FAIL: {', '.join(loaded)} should not be imported at startup")
+        failed = True
+    if args.max_seconds is not None and median_import > args.max_seconds:
+        print(f"FAIL: median import time {median_import:.3f}s exceeds {args.max_seconds:.3f}s")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
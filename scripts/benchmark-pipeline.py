@@ -0,0 +1,320 @@
+"""Offline end-to-end benchmark of the TelcoPulse pipeline.
+
+Runs every stage locally, without AWS:
+
+    app.py uploader -> in-process sharded Kinesis stand-in -> local Spark aggregation
+    (same KPIs and S3 layout as scripts/transform-stream-data.py) -> dashboard KPI
+    queries from app/dashboard.py executed by DuckDB over the local output
+
+For each data scale it reports the sustained records/s, the event-to-dashboard
+latency percentiles (Kinesis arrival to the first dashboard query that includes the
+record) and the time spent in each stage.
+
+    pip install pyspark duckdb
+    python scripts/benchmark-pipeline.py --scales 1000,10000,100000 --shards 4
+"""
+import argparse
+import contextlib
+import csv
+import hashlib
+import importlib.util
+import io
+import os
+import re
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+REPO_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+UPLOADER_PATH = os.path.join(REPO_ROOT, "app.py")
+DASHBOARD_PATH = os.path.join(REPO_ROOT, "app", "dashboard.py")
+CSV_FILE_PATH = os.path.join(REPO_ROOT, "data", "mobile-logs.csv")
+
+# Kinesis limits a single GetRecords call to 10000 records
+GET_RECORDS_LIMIT = 10000
+
+STAGES = ["produce", "stream_read", "spark", "dashboard_query"]
+
+# ------------------ Kinesis Stand-in ------------------
+class ShardedStreamStandIn:
+    """In-process Kinesis stream exposing the put_record/get_records calls the pipeline uses.
+
+    Partition keys are MD5-hashed onto evenly split 128-bit hash key ranges, as Kinesis
+    does, so skew from the uploader's choice of partition key shows up per shard.
+    """
+
+    def __init__(self, shard_count):
+        self.shard_count = shard_count
+        self.shards = [[] for _ in range(shard_count)]
+        self.positions = [0] * shard_count
+        self.sequence_number = 0
+        self.lock = threading.Lock()
+
+    def put_record(self, StreamName, Data, PartitionKey, **kwargs):
+        hash_key = int(hashlib.md5(PartitionKey.encode("utf-8")).hexdigest(), 16)
+        shard = (hash_key * self.shard_count) >> 128
+        data = Data.encode("utf-8") if isinstance(Data, str) else Data
+        with self.lock:
+            self.sequence_number += 1
+            self.shards[shard].append({
+                "SequenceNumber": str(self.sequence_number),
+                "ApproximateArrivalTimestamp": time.time(),
+                "Data": data,
+                "PartitionKey": PartitionKey
+            })
+            return {"ShardId": f"shardId-{shard:012d}", "SequenceNumber": str(self.sequence_number)}
+
+    def get_records(self, shard, limit=GET_RECORDS_LIMIT):
+        """Return the next records of a shard and advance its iterator."""
+        with self.lock:
+            start = self.positions[shard]
+            records = self.shards[shard][start:start + limit]
+            self.positions[shard] = start + len(records)
+        return records
+
+    def shard_sizes(self):
+        with self.lock:
+            return [len(records) for records in self.shards]
+
+# ------------------ Module Loading ------------------
+def load_module(name, path):
+    """Import one of the project's scripts by path without running its main()."""
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+# ------------------ Local Spark Job ------------------
+def create_spark_session(shuffle_partitions):
+    from pyspark.sql import SparkSession
+
+    return SparkSession.builder \
+        .master("local[*]") \
+        .appName("telcopulse-benchmark") \
+        .config("spark.sql.shuffle.partitions", str(shuffle_partitions)) \
+        .config("spark.ui.enabled", "false") \
+        .getOrCreate()
+
+def process_batch(spark, records, output_path, columns, batch_id):
+    """Aggregate one micro-batch and write it with the Glue job's S3 layout."""
+    from pyspark.sql import functions as SqlFuncs
+    from pyspark.sql.types import StructType, StructField, StringType
+
+    # Land the batch as JSON lines and let Spark scan it, as the job reads the stream's
+    # JSON payloads, instead of shipping Python rows to the JVM one by one
+    batch_path = os.path.join(output_path, "_incoming", f"batch-{batch_id}.json")
+    os.makedirs(os.path.dirname(batch_path), exist_ok=True)
+    with open(batch_path, "wb") as batch_file:
+        batch_file.write(b"\n".join(record["Data"] for record in records))
+
+    # The uploader sends CSV rows as JSON strings, the job casts them like its ApplyMapping node
+    schema = StructType([StructField(column, StringType(), True) for column in columns])
+    raw_df = spark.read.schema(schema).json(batch_path)
+    typed_df = raw_df \
+        .withColumn("signal", SqlFuncs.col("signal").cast("int")) \
+        .withColumn("precission", SqlFuncs.col("precission").cast("double")) \
+        .dropna(how="all")
+
+    average_df = typed_df.groupBy("operator").agg(
+        SqlFuncs.avg("signal").alias("avg_signal_#0"),
+        SqlFuncs.avg("precission").alias("avg_precission_#1")
+    )
+    status_df = typed_df.groupBy("postal_code", "description").agg(
+        SqlFuncs.count("status").alias("count_status_#0")
+    )
+
+    now = datetime.now(timezone.utc)
+    partition = f"ingest_year={now.year:04d}/ingest_month={now.month:02d}/ingest_day={now.day:02d}/ingest_hour={now.hour:02d}"
+    raw_df.coalesce(1).write.mode("append").parquet(f"{output_path}/raw/{partition}")
+    average_df.coalesce(1).write.mode("append").parquet(f"{output_path}/processed/average_by_operator/{partition}")
+    status_df.coalesce(1).write.mode("append").parquet(f"{output_path}/processed/status_by_postal_code/{partition}")
+
+# ------------------ Local Query Engine ------------------
+def to_duckdb_sql(query):
+    """Translate the Athena (Trino) date functions used by the dashboard to DuckDB."""
+    query = re.sub(r"DATE_ADD\('hour', -(\d+), CURRENT_TIMESTAMP\)", r"(CURRENT_TIMESTAMP - INTERVAL \1 HOUR)", query)
+    query = re.sub(r"DATE_FORMAT\((.+?), '%Y-%m-%d %H:%i:%s'\)", r"strftime(\1, '%Y-%m-%d %H:%M:%S')", query)
+    return query
+
+class LocalQueryEngine:
+    """Stands in for Athena: the Glue catalog tables become DuckDB views over the local output."""
+
+    TABLES = ["average_by_operator", "status_by_postal_code"]
+
+    def __init__(self, output_path):
+        import duckdb
+
+        self.output_path = output_path
+        self.connection = duckdb.connect()
+        self.connection.execute("SET TimeZone = 'UTC'")
+        self.views_created = False
+
+    def create_views(self):
+        # Partition values stay strings, as the Glue crawler catalogs them
+        for table in self.TABLES:
+            self.connection.execute(f"""
+                CREATE OR REPLACE VIEW {table} AS
+                SELECT * FROM read_parquet('{self.output_path}/processed/{table}/**/*.parquet',
+                                           hive_partitioning = true, hive_types_autocast = false)
+            """)
+        self.views_created = True
+
+    def run_query(self, query, database, output_location):
+        """Drop-in replacement for dashboard.run_athena_query."""
+        if not self.views_created:
+            self.create_views()
+        return self.connection.execute(to_duckdb_sql(query)).fetchdf()
+
+def run_dashboard_queries(dashboard, time_filter):
+    """Run the dashboard's KPI fetchers, bypassing the Streamlit cache."""
+    results = []
+    for fetch in (dashboard.get_operator_metrics, dashboard.get_postal_code_status, dashboard.get_hourly_metrics):
+        fetch.clear()
+        results.append(fetch("local", "local", time_filter))
+    return results
+
+# ------------------ Benchmark ------------------
+def percentile(values, q):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q / 100 * len(values)))]
+
+def run_scale(spark, uploader, dashboard, rows, columns, num_records, args):
+    """Push num_records through the whole pipeline and return the measurements."""
+    output_path = tempfile.mkdtemp(prefix=f"telcopulse-benchmark-{num_records}-")
+    stream = ShardedStreamStandIn(args.shards)
+    engine = LocalQueryEngine(output_path)
+    uploader.kinesis_client = stream
+    dashboard.run_athena_query = engine.run_query
+
+    stage_seconds = dict.fromkeys(STAGES, 0.0)
+    latencies = []
+    batches = 0
+    producer_done = threading.Event()
+
+    def produce():
+        # send_to_kinesis is called directly, process_file only adds the Streamlit progress UI
+        interval = 1.0 / args.rate if args.rate > 0 else 0.0
+        start = time.perf_counter()
+        for i in range(num_records):
+            uploader.send_to_kinesis(rows[i % len(rows)])
+            if interval:
+                time.sleep(max(0.0, start + (i + 1) * interval - time.perf_counter()))
+        stage_seconds["produce"] = time.perf_counter() - start
+        producer_done.set()
+
+    started_at = time.perf_counter()
+    # send_to_kinesis prints every record, keep that out of the report
+    with contextlib.redirect_stdout(io.StringIO()):
+        producer = threading.Thread(target=produce)
+        producer.start()
+
+        consumed = 0
+        while consumed < num_records:
+            batch_started = time.perf_counter()
+            finished = producer_done.is_set()
+
+            read_started = time.perf_counter()
+            records = []
+            for shard in range(args.shards):
+                while True:
+                    shard_records = stream.get_records(shard)
+                    records.extend(shard_records)
+                    if len(shard_records) < GET_RECORDS_LIMIT:
+                        break
+            stage_seconds["stream_read"] += time.perf_counter() - read_started
+
+            if records:
+                spark_started = time.perf_counter()
+                process_batch(spark, records, output_path, columns, batches)
+                stage_seconds["spark"] += time.perf_counter() - spark_started
+
+                query_started = time.perf_counter()
+                run_dashboard_queries(dashboard, args.time_filter)
+                stage_seconds["dashboard_query"] += time.perf_counter() - query_started
+
+                visible_at = time.time()
+                latencies.extend(visible_at - record["ApproximateArrivalTimestamp"] for record in records)
+                consumed += len(records)
+                batches += 1
+            elif finished:
+                break
+
+            # Trigger the next micro-batch on the job's window, like processingTime triggers
+            time.sleep(max(0.0, batch_started + args.window_seconds - time.perf_counter()))
+
+        producer.join()
+    elapsed = time.perf_counter() - started_at
+
+    shard_sizes = stream.shard_sizes()
+    if not args.keep_output:
+        shutil.rmtree(output_path, ignore_errors=True)
+
+    return {
+        "records": consumed,
+        "batches": batches,
+        "elapsed": elapsed,
+        "stage_seconds": stage_seconds,
+        "latencies": latencies,
+        "shard_sizes": shard_sizes,
+        "output_path": output_path
+    }
+
+def print_report(result):
+    records, elapsed = result["records"], result["elapsed"]
+    latencies = result["latencies"]
+    print(f"\n=== {records} records in {result['batches']} micro-batches ===")
+    print(f"Sustained throughput: {records / elapsed:,.0f} records/s ({elapsed:.2f}s end to end)")
+    print("Event-to-dashboard latency: " + ", ".join(
+        f"p{q} {percentile(latencies, q):.3f}s" for q in (50, 95, 99)
+    ) + f", max {max(latencies) if latencies else float('nan'):.3f}s")
+    print("Stage breakdown (produce runs concurrently with the other stages):")
+    for stage in STAGES:
+        seconds = result["stage_seconds"][stage]
+        print(f"  {stage:<16} {seconds:8.3f}s  {seconds / elapsed:6.1%} of wall time")
+    print(f"Records per shard: {result['shard_sizes']}")
+    if statistics.pstdev(result["shard_sizes"]) > 0:
+        print(f"Hottest shard holds {max(result['shard_sizes']) / records:.1%} of the records")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline end to end without AWS.")
+    parser.add_argument("--scales", default="1000,10000,100000", help="Comma-separated record counts to push through")
+    parser.add_argument("--shards", type=int, default=4, help="Shards of the Kinesis stand-in")
+    parser.add_argument("--rate", type=float, default=0, help="Producer records/s, 0 sends as fast as possible")
+    parser.add_argument("--window-seconds", type=float, default=1.0, help="Micro-batch trigger interval")
+    parser.add_argument("--time-filter", default="1 hour", help="Dashboard time window used by the queries")
+    parser.add_argument("--shuffle-partitions", type=int, default=4, help="spark.sql.shuffle.partitions")
+    parser.add_argument("--keep-output", action="store_true", help="Keep the local output directories")
+    args = parser.parse_args()
+
+    with open(CSV_FILE_PATH, mode='r') as file:
+        csv_reader = csv.DictReader(file)
+        columns = csv_reader.fieldnames
+        rows = list(csv_reader)
+
+    setup_started = time.perf_counter()
+    # Streamlit warns about the missing script run context on every cached call. Its
+    # loggers do not propagate and are reset to the logger.level option whenever the
+    # config is parsed, so the option is set as well as the current loggers' level
+    import streamlit.logger
+    from streamlit import config as streamlit_config
+    streamlit_config.set_option("logger.level", "error")
+    streamlit.logger.set_log_level("error")
+    uploader = load_module("uploader", UPLOADER_PATH)
+    dashboard = load_module("dashboard", DASHBOARD_PATH)
+    spark = create_spark_session(args.shuffle_partitions)
+    spark.sparkContext.setLogLevel("ERROR")
+    print(f"Setup (module imports and Spark session): {time.perf_counter() - setup_started:.2f}s")
+
+    try:
+        for num_records in (int(scale) for scale in args.scales.split(",")):
+            print_report(run_scale(spark, uploader, dashboard, rows, columns, num_records, args))
+    finally:
+        spark.stop()
+
+if __name__ == "__main__":
+    main()
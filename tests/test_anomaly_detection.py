@@ -0,0 +1,84 @@
+import math
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "module", "s3", "scripts"))
+
+from anomaly_detection import ewma_update, observe, share_std
+
+PARAMS = dict(alpha=0.1, z_threshold=4.0, warmup=5, min_std=0.05)
+
+def test_ewma_update_moves_mean_toward_value():
+    mean, var = ewma_update(1.0, 0.0, 0.0, 0.1)
+    assert mean == pytest.approx(0.9)
+    assert var == pytest.approx(0.9 * (1.0 * 0.1))
+
+def test_ewma_update_is_stationary_on_constant_input():
+    mean, var = 2.0, 0.0
+    for _ in range(20):
+        mean, var = ewma_update(mean, var, 2.0, 0.1)
+    assert (mean, var) == (2.0, 0.0)
+
+def test_first_observation_seeds_baseline():
+    state, anomaly = observe(None, 0.8, **PARAMS)
+    assert state == (1, 0.8, 0.0)
+    assert anomaly is None
+
+def test_no_alert_during_warmup():
+    state = (1, 0.0, 0.0)
+    state, anomaly = observe(state, 1.0, **PARAMS)
+    assert anomaly is None
+    assert state[0] == 2
+
+def test_share_spike_alerts_after_warmup():
+    state = None
+    for _ in range(10):
+        state, anomaly = observe(state, 0.0, **PARAMS)
+        assert anomaly is None
+
+    state, anomaly = observe(state, 0.5, **PARAMS)
+    z_score, std, mean = anomaly
+    assert std == 0.05
+    assert mean == 0.0
+    assert z_score == pytest.approx(10.0)
+
+def test_outlier_is_clipped_before_folding_in():
+    state = (10, 0.0, 0.0)
+    state, _ = observe(state, 0.5, **PARAMS)
+    # Folded in as mean + z_threshold * std = 0.2, not 0.5
+    assert state[1] == pytest.approx(0.02)
+
+def test_drop_gives_negative_z_score():
+    state = (10, 3.0, 0.0)
+    _, anomaly = observe(state, 0.0, alpha=0.1, z_threshold=4.0, warmup=5, min_std=0.5)
+    assert anomaly[0] == pytest.approx(-6.0)
+
+def test_share_std_is_binomial():
+    assert share_std(0.5, 4, 0.05) == pytest.approx(0.25)
+
+def test_share_std_keeps_share_off_the_bounds():
+    assert share_std(0.0, 5, 0.05) == pytest.approx(math.sqrt(0.05 * 0.95 / 5))
+    assert share_std(1.0, 5, 0.05) == pytest.approx(share_std(0.0, 5, 0.05))
+
+def test_single_degraded_record_in_small_batch_is_not_an_anomaly():
+    # One out-of-service record out of five against an all in-service baseline
+    state = (10, 0.0, 0.0)
+    _, anomaly = observe(state, 0.2, alpha=0.1, z_threshold=4.0, warmup=5, min_std=0.0,
+                         std=share_std(0.0, 5, 0.05), two_sided=False)
+    assert anomaly is None
+
+def test_degraded_majority_is_an_anomaly():
+    state = (10, 0.0, 0.0)
+    _, anomaly = observe(state, 0.6, alpha=0.1, z_threshold=4.0, warmup=5, min_std=0.0,
+                         std=share_std(0.0, 5, 0.05), two_sided=False)
+    assert anomaly[0] == pytest.approx(0.6 / share_std(0.0, 5, 0.05))
+
+def test_one_sided_ignores_drops():
+    state = (10, 0.8, 0.0)
+    state, anomaly = observe(state, 0.0, alpha=0.1, z_threshold=4.0, warmup=5, min_std=0.0,
+                             std=share_std(0.8, 50, 0.05), two_sided=False)
+    assert anomaly is None
+    # Not clipped either, the baseline follows the recovery
+    assert state[1] == pytest.approx(0.72)
@@ -0,0 +1,69 @@
+import importlib.util
+import os
+
+import pytest
+
+SCRIPT_PATH = os.path.join(os.path.dirname(__file__), "..", "scripts", "benchmark-pipeline.py")
+
+spec = importlib.util.spec_from_file_location("benchmark_pipeline", SCRIPT_PATH)
+benchmark_pipeline = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(benchmark_pipeline)
+
+ShardedStreamStandIn = benchmark_pipeline.ShardedStreamStandIn
+to_duckdb_sql = benchmark_pipeline.to_duckdb_sql
+
+DASHBOARD_FILTER = """
+    WHERE CONCAT(ingest_year, '-', ingest_month, '-', ingest_day, ' ', ingest_hour, ':00:00') >=
+          DATE_FORMAT(DATE_ADD('hour', -6, CURRENT_TIMESTAMP), '%Y-%m-%d %H:%i:%s')
+"""
+
+def test_to_duckdb_sql_translates_date_add():
+    assert to_duckdb_sql("DATE_ADD('hour', -24, CURRENT_TIMESTAMP)") == "(CURRENT_TIMESTAMP - INTERVAL 24 HOUR)"
+
+def test_to_duckdb_sql_translates_dashboard_filter():
+    query = to_duckdb_sql(DASHBOARD_FILTER)
+    assert "strftime((CURRENT_TIMESTAMP - INTERVAL 6 HOUR), '%Y-%m-%d %H:%M:%S')" in query
+    assert "DATE_ADD" not in query and "DATE_FORMAT" not in query
+
+def test_to_duckdb_sql_leaves_other_sql_untouched():
+    query = "SELECT operator, AVG(\"avg_signal_#0\") FROM average_by_operator GROUP BY operator"
+    assert to_duckdb_sql(query) == query
+
+def test_to_duckdb_sql_runs_on_duckdb():
+    duckdb = pytest.importorskip("duckdb")
+    query = to_duckdb_sql("SELECT DATE_FORMAT(DATE_ADD('hour', -1, CURRENT_TIMESTAMP), '%Y-%m-%d %H:%i:%s') AS since")
+    since = duckdb.sql(query).fetchone()[0]
+    assert len(since) == len("2025-01-01 00:00:00")
+
+def test_stream_routes_a_partition_key_to_one_shard():
+    stream = ShardedStreamStandIn(4)
+    shard_ids = {stream.put_record(StreamName="s", Data="{}", PartitionKey="28001")["ShardId"] for _ in range(5)}
+    assert len(shard_ids) == 1
+    assert max(stream.shard_sizes()) == 5
+
+def test_stream_spreads_keys_over_all_shards():
+    stream = ShardedStreamStandIn(4)
+    for key in range(1000):
+        stream.put_record(StreamName="s", Data="{}", PartitionKey=str(key))
+    sizes = stream.shard_sizes()
+    assert sum(sizes) == 1000
+    assert min(sizes) > 150
+
+def test_stream_get_records_advances_iterator_in_order():
+    stream = ShardedStreamStandIn(1)
+    for i in range(5):
+        stream.put_record(StreamName="s", Data=f'{{"i": {i}}}', PartitionKey="key")
+
+    first = stream.get_records(0, limit=3)
+    rest = stream.get_records(0, limit=3)
+    assert [record["Data"] for record in first + rest] == [f'{{"i": {i}}}'.encode("utf-8") for i in range(5)]
+    assert len(first) == 3 and len(rest) == 2
+    assert stream.get_records(0) == []
+
+def test_stream_sequence_numbers_increase_across_shards():
+    stream = ShardedStreamStandIn(2)
+    sequence_numbers = [
+        int(stream.put_record(StreamName="s", Data=b"{}", PartitionKey=str(key))["SequenceNumber"])
+        for key in range(10)
+    ]
+    assert sequence_numbers == list(range(1, 11))
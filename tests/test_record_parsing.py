@@ -0,0 +1,63 @@
+import csv
+import json
+import os
+import shutil
+import sys
+
+import pytest
+
+pytest.importorskip("pyspark")
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "module", "s3", "scripts"))
+
+from record_parsing import RECORD_FIELDS, parse_records
+
+CSV_FILE_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "mobile-logs.csv")
+
+@pytest.fixture(scope="module")
+def spark():
+    if not os.environ.get("JAVA_HOME") and shutil.which("java") is None:
+        pytest.skip("local Spark needs a Java runtime")
+    from pyspark.sql import SparkSession
+
+    session = SparkSession.builder \
+        .master("local[1]") \
+        .config("spark.ui.enabled", "false") \
+        .getOrCreate()
+    yield session
+    session.stop()
+
+@pytest.fixture(scope="module")
+def csv_rows():
+    with open(CSV_FILE_PATH, mode="r") as file:
+        return list(csv.DictReader(file))[:20]
+
+def parse_payloads(spark, payloads):
+    # Same payloads app.py's send_to_kinesis puts on the stream
+    json_df = spark.createDataFrame([(payload,) for payload in payloads], "json_data string")
+    return parse_records(json_df).collect()
+
+def test_uploader_payload_is_typed(spark, csv_rows):
+    row = csv_rows[0]
+    parsed = parse_payloads(spark, [json.dumps(row)])[0]
+
+    assert parsed["signal"] == int(row["signal"])
+    assert parsed["status"] == int(row["status"])
+    assert parsed["precission"] == float(row["precission"])
+    assert parsed["lat"] == float(row["lat"])
+    assert parsed["postal_code"] == float(row["postal_code"])
+    assert parsed["operator"] == row["operator"]
+    assert parsed["description"] == row["description"]
+
+def test_every_numeric_value_of_the_sample_is_parsed(spark, csv_rows):
+    parsed = parse_payloads(spark, [json.dumps(row) for row in csv_rows])
+
+    assert len(parsed) == len(csv_rows)
+    for row, record in zip(csv_rows, parsed):
+        assert list(record.asDict()) == RECORD_FIELDS
+        for field in ("signal", "precission", "postal_code"):
+            assert (record[field] is None) == (row[field] == "")
+
+def test_empty_postal_code_is_null(spark, csv_rows):
+    row = dict(csv_rows[0], postal_code="")
+    assert parse_payloads(spark, [json.dumps(row)])[0]["postal_code"] is None